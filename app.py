@@ -10,6 +10,7 @@ from pydub.effects import normalize, high_pass_filter
 from pydub.silence import detect_nonsilent
 from faster_whisper import WhisperModel
 import yt_dlp
+from sfx_library import ingest_file
 
 # ==========================================
 # ⚙️ إعدادات الصفحة
@@ -151,7 +152,7 @@ def get_sfx_file(category):
         final_path = filename_path + ".mp3"
         # 🛡️ نقطة التفتيش: هل نجح التحميل والملف سليم؟
         if os.path.exists(final_path) and os.path.getsize(final_path) > 20000:
-            return final_path
+            return ingest_file(final_path, category, SFX_DIR)
     except: pass
 
     # محاولة 2: YouTube (Android Mode)
@@ -163,7 +164,7 @@ def get_sfx_file(category):
             ydl.download([f"ytsearch1:{search_query} sound effect no copyright"])
         final_path = filename_path + ".mp3"
         if os.path.exists(final_path) and os.path.getsize(final_path) > 20000:
-            return final_path
+            return ingest_file(final_path, category, SFX_DIR)
     except: pass
 
     st.warning(f"❌ فشل العثور على ملف سليم لـ: {category}")
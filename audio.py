@@ -10,6 +10,8 @@ from pydub.effects import normalize, high_pass_filter
 from pydub.silence import detect_nonsilent
 import yt_dlp
 from faster_whisper import WhisperModel
+from sfx_library import (compute_content_hash, find_by_source, find_duplicate, fingerprint_audio,
+                          register_file, remember_source)
 
 # ==========================================
 # 🛠️ الإعدادات والمسارات
@@ -178,8 +180,8 @@ def camouflage_audio(filepath):
         camouflaged = sound._spawn(sound.raw_data, overrides={'frame_rate': new_sample_rate})
         camouflaged = camouflaged.set_frame_rate(44100)
         camouflaged.export(filepath, format="mp3")
-        return True
-    except: return False
+        return camouflaged
+    except: return None
 
 def check_audio_quality(filepath):
     try:
@@ -248,8 +250,16 @@ def get_best_variation(category, data_map):
         target_download = f"ytsearch1:{search_base} sound effect short no copyright"
     else:
         print(f"      🏆 الفائز: {best_title} ({best_score})")
+        # 🛡️ نفس الرابط حُمّل من قبل؟ نستخدم الملف المطابق بدون تحميل
+        known_file = find_by_source(best_url, category, SFX_DIR)
+        if known_file:
+            print(f"      📦 الرابط معروف مسبقاً: {os.path.basename(known_file)}")
+            if known_file in files:
+                last_used_file_index[category] = files.index(known_file)
+            return known_file
 
     new_id = len(files) + 1
+    while os.path.exists(os.path.join(SFX_DIR, f"{category}_{new_id}.mp3")): new_id += 1
     filename = f"{category}_{new_id}.mp3"
     filepath = os.path.join(SFX_DIR, filename)
     
@@ -267,7 +277,22 @@ def get_best_variation(category, data_map):
             ydl.download([target_download])
         if os.path.exists(filepath):
             if check_audio_quality(filepath):
-                camouflage_audio(filepath)
+                # 🛡️ نفس المقطع موجود مسبقاً؟ نحذف النسخة الجديدة قبل التمويه
+                source_sha256 = compute_content_hash(filepath)
+                duplicate_of, fingerprint = find_duplicate(filepath, category, SFX_DIR, content_hash=source_sha256)
+                if duplicate_of:
+                    print(f"      ♻️ الملف مكرر لـ {os.path.basename(duplicate_of)}، تم حذفه")
+                    os.remove(filepath)
+                    if best_url:
+                        remember_source(duplicate_of, best_url, SFX_DIR)
+                    if duplicate_of in files:
+                        last_used_file_index[category] = files.index(duplicate_of)
+                    return duplicate_of
+                # نبصم الصوت المموّه الموجود في الذاكرة بدل إعادة فك ترميز الملف
+                camouflaged = camouflage_audio(filepath)
+                if camouflaged is not None:
+                    fingerprint = fingerprint_audio(camouflaged)
+                register_file(filepath, fingerprint, SFX_DIR, source_sha256=source_sha256, source_url=best_url)
                 last_used_file_index[category] = new_id - 1
                 return filepath
     except Exception as e:
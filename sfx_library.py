@@ -0,0 +1,379 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from pydub import AudioSegment
+
+# ==========================================
+# 🗂️ فهرس مكتبة المؤثرات (بصمة المحتوى + منع التكرار)
+# ==========================================
+SFX_DIR = "sfx_robust"
+LIBRARY_FILE = "library.json"
+LOCK_TIMEOUT_SEC = 10
+
+# إعدادات البصمة: تحليل خشن بمعدل منخفض يكفي للمقارنة
+FP_SAMPLE_RATE = 11025
+FP_BANDS = 16
+FP_ENVELOPE_POINTS = 32
+FP_MIN_HZ = 60
+FP_MAX_HZ = 5000
+FP_MIN_SAMPLES = 1024
+# القص بالطاقة التراكمية (وليس بعتبة لكل إطار) حتى يبقى ثابتاً مع الضوضاء والصمت الزائد
+FP_TRIM_HEAD = 0.005
+FP_TRIM_TAIL = 0.99
+
+# حدود اعتبار ملفين نسخة واحدة، مضبوطة على التمويه بسرعة 0.96 و 1.04
+# (test_sfx_library.py): النسخة الممَوَّهة تبقى فوقها، واللقطة المختلفة تسقط
+DURATION_TOLERANCE = 0.045
+DURATION_SLACK_SEC = 0.025
+BANDS_MIN_CORR = 0.92
+ENVELOPE_MIN_CORR = 0.95
+
+_CATEGORY_RE = re.compile(r"^(.*?)_v?(\d+)\.mp3$")
+
+
+def category_of(filename):
+    # glass_2.mp3 -> glass ، door_close_v8.mp3 -> door_close
+    match = _CATEGORY_RE.match(os.path.basename(filename))
+    return match.group(1) if match else None
+
+
+def _file_order(filename):
+    match = _CATEGORY_RE.match(filename)
+    return (int(match.group(2)) if match else 0, filename)
+
+
+# ==========================================
+# 🔑 البصمة
+# ==========================================
+def compute_content_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_fingerprint(filepath):
+    try:
+        sound = AudioSegment.from_file(filepath)
+    except Exception as e:
+        print(f"      ⚠️ تعذر قراءة {os.path.basename(filepath)} للبصمة: {e}")
+        return None
+    return fingerprint_audio(sound)
+
+
+def fingerprint_audio(sound):
+    sound = sound.set_channels(1).set_frame_rate(FP_SAMPLE_RATE)
+    samples = np.array(sound.get_array_of_samples(), dtype=np.float64)
+
+    # قص الصمت من الطرفين: من أول 0.5% من الطاقة حتى 99% منها
+    energy = np.cumsum(samples ** 2)
+    if len(energy) == 0 or energy[-1] <= 0:
+        return None
+    start = int(np.searchsorted(energy, energy[-1] * FP_TRIM_HEAD))
+    end = int(np.searchsorted(energy, energy[-1] * FP_TRIM_TAIL)) + 1
+    trimmed = samples[start:end]
+    if len(trimmed) < FP_MIN_SAMPLES:
+        return None
+
+    # طاقة النطاقات الترددية (مقياس لوغاريتمي) من طيف المقطع كاملاً
+    power = np.abs(np.fft.rfft(trimmed * np.hanning(len(trimmed)))) ** 2
+    freqs = np.fft.rfftfreq(len(trimmed), 1.0 / FP_SAMPLE_RATE)
+    edges = np.geomspace(FP_MIN_HZ, FP_MAX_HZ, FP_BANDS + 1)
+    band_idx = np.digitize(freqs, edges) - 1
+    bands = np.array([power[band_idx == b].sum() for b in range(FP_BANDS)])
+    bands = np.log10(bands + 1e-9)
+    bands -= bands.mean()
+
+    # غلاف الطاقة عبر الزمن بعدد نقاط ثابت (لا يتأثر بتغيير السرعة)
+    envelope = np.array([np.sqrt(np.mean(chunk ** 2))
+                         for chunk in np.array_split(trimmed, FP_ENVELOPE_POINTS)])
+    envelope /= envelope.max()
+
+    return {
+        "duration": round(len(trimmed) / FP_SAMPLE_RATE, 3),
+        "bands": [round(float(x), 4) for x in bands],
+        "envelope": [round(float(x), 3) for x in envelope],
+    }
+
+
+def _correlation(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if a.std() == 0 or b.std() == 0:
+        return 1.0 if np.allclose(a, b) else 0.0
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def is_near_duplicate(fp_a, fp_b):
+    # المدخلات التي فشلت بصمتها تُقارن بالـ hash فقط
+    if not fp_a or not fp_b or "bands" not in fp_a or "bands" not in fp_b:
+        return False
+    longest = max(fp_a["duration"], fp_b["duration"])
+    if abs(fp_a["duration"] - fp_b["duration"]) > longest * DURATION_TOLERANCE + DURATION_SLACK_SEC:
+        return False
+    return (_correlation(fp_a["bands"], fp_b["bands"]) >= BANDS_MIN_CORR
+            and _correlation(fp_a["envelope"], fp_b["envelope"]) >= ENVELOPE_MIN_CORR)
+
+
+# ==========================================
+# 📒 ملف الفهرس
+# ==========================================
+def load_library(sfx_dir=SFX_DIR):
+    path = os.path.join(sfx_dir, LIBRARY_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            library = json.load(f)
+        if isinstance(library.get("files"), dict):
+            return library
+    except (OSError, ValueError):
+        pass
+    return {"files": {}}
+
+
+def save_library(library, sfx_dir=SFX_DIR):
+    # ملف مؤقت فريد لكل كاتب ثم استبدال ذري
+    with tempfile.NamedTemporaryFile("w", dir=sfx_dir, prefix=LIBRARY_FILE + ".", suffix=".tmp",
+                                     delete=False, encoding="utf-8") as f:
+        json.dump(library, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(f.name, os.path.join(sfx_dir, LIBRARY_FILE))
+
+
+@contextmanager
+def _library_lock(sfx_dir):
+    # قفل بسيط بملف (يعمل على ويندوز ولينكس) لأن جلسات Streamlit تكتب الفهرس بالتوازي
+    path = os.path.join(sfx_dir, LIBRARY_FILE + ".lock")
+    deadline = time.time() + LOCK_TIMEOUT_SEC
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                # قفل متروك من عملية توقفت (القفل لا يُمسك إلا لحظة القراءة والكتابة)
+                if time.time() - os.path.getmtime(path) > LOCK_TIMEOUT_SEC:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"تعذر قفل {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try: os.remove(path)
+        except OSError: pass
+
+
+def _update_library(sfx_dir, update):
+    # قراءة ← تعديل ← كتابة تحت القفل؛ فك الترميز يتم قبلها خارج القفل
+    with _library_lock(sfx_dir):
+        library = load_library(sfx_dir)
+        _prune_library(library, sfx_dir)
+        update(library["files"])
+        save_library(library, sfx_dir)
+
+
+def _prune_library(library, sfx_dir):
+    # يحذف من الفهرس الملفات المختفية أو التي تغير حجمها (بدون فك ترميز)
+    files = library["files"]
+    changed = False
+    for name in list(files):
+        path = os.path.join(sfx_dir, name)
+        if not os.path.exists(path) or files[name].get("size") != os.path.getsize(path):
+            del files[name]
+            changed = True
+    return changed
+
+
+def _make_entry(filepath, fingerprint, source_sha256=None, source_url=None):
+    # الملفات التي فشلت بصمتها تُسجل أيضاً حتى لا نعيد فك ترميزها في كل مرة
+    entry = dict(fingerprint) if fingerprint else {"fingerprint_failed": True}
+    entry["sha256"] = compute_content_hash(filepath)
+    entry["size"] = os.path.getsize(filepath)
+    entry["category"] = category_of(filepath)
+    if source_sha256:
+        entry["source_sha256"] = source_sha256
+    if source_url:
+        entry["source_urls"] = [source_url]
+    return entry
+
+
+def _index_missing(library, sfx_dir, names, save=True):
+    # يبصم الملفات غير المفهرسة خارج القفل ثم يدمجها في الفهرس
+    files = library["files"]
+    new_entries = {}
+    for name in names:
+        if name not in files:
+            path = os.path.join(sfx_dir, name)
+            new_entries[name] = _make_entry(path, compute_fingerprint(path))
+    files.update(new_entries)
+    if new_entries and save:
+        def update(saved):
+            for name, entry in new_entries.items():
+                saved.setdefault(name, entry)
+        _update_library(sfx_dir, update)
+
+
+def sync_library(sfx_dir=SFX_DIR, save=True):
+    # فهرسة المجلد كاملاً (للتنظيف اليدوي فقط، مكلفة لأنها تفك ترميز كل ملف جديد)
+    library = load_library(sfx_dir)
+    _prune_library(library, sfx_dir)
+    on_disk = sorted(f for f in os.listdir(sfx_dir) if f.endswith(".mp3"))
+    _index_missing(library, sfx_dir, on_disk, save=save)
+    return library
+
+
+def _same_sound(entry_a, entry_b):
+    return entry_a.get("sha256") == entry_b.get("sha256") or is_near_duplicate(entry_a, entry_b)
+
+
+# ==========================================
+# 🛡️ حارس الاستيراد (قبل إضافة أي ملف جديد)
+# ==========================================
+def find_by_source(source_url, category, sfx_dir=SFX_DIR):
+    # هل حُمّل هذا الرابط من قبل (محفوظاً أو مرفوضاً كمكرر)؟ نتجنب التحميل من جديد
+    library = load_library(sfx_dir)
+    _prune_library(library, sfx_dir)
+    for name in sorted(library["files"], key=_file_order):
+        entry = library["files"][name]
+        if entry.get("category") == category and source_url in entry.get("source_urls", []):
+            return os.path.join(sfx_dir, name)
+    return None
+
+
+def remember_source(filepath, source_url, sfx_dir=SFX_DIR):
+    # نربط الرابط بالملف الموجود حتى لا يُحمّل المكرر مرة أخرى
+    name = os.path.basename(filepath)
+
+    def update(files):
+        if name in files and source_url not in files[name].setdefault("source_urls", []):
+            files[name]["source_urls"].append(source_url)
+    _update_library(sfx_dir, update)
+
+
+def find_duplicate(filepath, category, sfx_dir=SFX_DIR, content_hash=None):
+    """يرجع (مسار النسخة الموجودة أو None، بصمة الملف الجديد)."""
+    new_name = os.path.basename(filepath)
+    library = load_library(sfx_dir)
+    files = library["files"]
+    _prune_library(library, sfx_dir)
+
+    def candidates():
+        return sorted((name for name, entry in files.items()
+                       if entry.get("category") == category and name != new_name), key=_file_order)
+
+    # 1. تطابق حرفي عبر الـ hash مع الفهرس الحالي (بدون فك ترميز)
+    # source_sha256 هو hash التحميل الخام قبل التمويه
+    if content_hash is None:
+        content_hash = compute_content_hash(filepath)
+    for name in candidates():
+        if content_hash in (files[name].get("sha256"), files[name].get("source_sha256")):
+            return os.path.join(sfx_dir, name), None
+
+    # 2. فهرسة ملفات نفس الفئة فقط إن لم تُفهرس بعد (مرة واحدة لكل ملف)
+    same_category = [f for f in os.listdir(sfx_dir)
+                     if category_of(f) == category and f != new_name]
+    _index_missing(library, sfx_dir, same_category)
+
+    # 3. تطابق تقريبي عبر البصمة الطيفية
+    new_entry = {"sha256": content_hash}
+    fingerprint = compute_fingerprint(filepath)
+    if fingerprint:
+        new_entry.update(fingerprint)
+    for name in candidates():
+        if _same_sound(files[name], new_entry):
+            return os.path.join(sfx_dir, name), fingerprint
+    return None, fingerprint
+
+
+def register_file(filepath, fingerprint=None, sfx_dir=SFX_DIR, source_sha256=None, source_url=None):
+    # البصمة يجب أن تصف الملف كما هو على القرص (بعد التمويه إن وُجد)
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(filepath)
+    name = os.path.basename(filepath)
+    entry = _make_entry(filepath, fingerprint, source_sha256, source_url)
+
+    def update(files):
+        files[name] = entry
+    _update_library(sfx_dir, update)
+    return fingerprint is not None
+
+
+def ingest_file(filepath, category, sfx_dir=SFX_DIR):
+    # يرجع المسار الذي يجب استخدامه: الملف الجديد، أو النسخة الموجودة إن كان مكرراً
+    existing, fingerprint = find_duplicate(filepath, category, sfx_dir)
+    if existing:
+        print(f"      ♻️ {os.path.basename(filepath)} مكرر لـ {os.path.basename(existing)}، تم حذفه")
+        try: os.remove(filepath)
+        except OSError: pass
+        return existing
+    register_file(filepath, fingerprint, sfx_dir)
+    return filepath
+
+
+# ==========================================
+# 🧹 تنظيف المكتبة الحالية (مرة واحدة)
+# ==========================================
+def dedupe_library(sfx_dir=SFX_DIR, dry_run=False):
+    # التجربة (dry_run) لا تكتب الفهرس ولا تحذف شيئاً
+    library = sync_library(sfx_dir, save=not dry_run)
+    files = library["files"]
+
+    # الملفات ذات الأسماء غير المعروفة (بدون فئة) لا تُدمج
+    by_category = {}
+    for name in sorted(files, key=_file_order):
+        if files[name].get("category"):
+            by_category.setdefault(files[name]["category"], []).append(name)
+
+    # الدمج داخل نفس الفئة فقط: نبقي النسخة ذات الرقم الأصغر ونحذف الباقي
+    removed = []
+    for category, names in by_category.items():
+        kept = []
+        for name in names:
+            original = next((k for k in kept if _same_sound(files[k], files[name])), None)
+            if original is None:
+                kept.append(name)
+            else:
+                removed.append((name, original))
+
+    for name, original in removed:
+        print(f"🗑️ {name} ← مكرر لـ {original}")
+        if not dry_run:
+            try: os.remove(os.path.join(sfx_dir, name))
+            except OSError: pass
+
+    # التكرار بين فئات مختلفة نكتفي بالإبلاغ عنه (كل فئة تحتاج ملفها)
+    removed_names = {name for name, _ in removed}
+    names = [name for name in sorted(files, key=_file_order) if name not in removed_names]
+    for i, name in enumerate(names):
+        for other in names[i + 1:]:
+            if files[name].get("category") == files[other].get("category"):
+                continue
+            if files[name]["sha256"] == files[other]["sha256"]:
+                print(f"ℹ️ {other} مطابق حرفياً لـ {name} (فئة مختلفة، لم يُحذف)")
+            elif is_near_duplicate(files[name], files[other]):
+                print(f"ℹ️ {other} يشبه {name} (فئة مختلفة، لم يُحذف)")
+
+    if not dry_run and removed:
+        def update(saved):
+            for name in removed_names:
+                saved.pop(name, None)
+        _update_library(sfx_dir, update)
+    print(f"✅ انتهى التنظيف: {len(removed)} ملف مكرر" + (" (تجربة فقط)" if dry_run else ""))
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="حذف المؤثرات المكررة من مكتبة sfx_robust")
+    parser.add_argument("--dir", default=SFX_DIR)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    dedupe_library(args.dir, dry_run=args.dry_run)
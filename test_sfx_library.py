@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pytest
+from pydub import AudioSegment
+
+import sfx_library
+
+RATE = 44100
+
+
+def _noise_burst(seed, decay, duration):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(RATE * duration)) / RATE
+    x = np.convolve(rng.standard_normal(len(t)), np.ones(3) / 3, mode="same") * np.exp(-t / decay)
+    x = (x / np.abs(x).max() * 20000).astype(np.int16)
+    return AudioSegment(x.tobytes(), frame_rate=RATE, sample_width=2, channels=1)
+
+
+def _footsteps(seed, duration):
+    rng = np.random.default_rng(seed)
+    x = 0.02 * rng.standard_normal(int(RATE * duration))
+    steps = np.arange(0.1, duration - 0.2, 0.45)
+    for pos in steps + rng.uniform(-0.05, 0.05, len(steps)):
+        i, n = int(pos * RATE), int(0.08 * RATE)
+        x[i:i + n] += rng.standard_normal(n) * np.exp(-np.arange(n) / RATE / 0.02)
+    x = (x / np.abs(x).max() * 20000).astype(np.int16)
+    return AudioSegment(x.tobytes(), frame_rate=RATE, sample_width=2, channels=1)
+
+
+def _camouflage(sound, speed):
+    # نفس تحويل camouflage_audio في audio.py (بدون إعادة الترميز إلى mp3)
+    camouflaged = sound._spawn(sound.raw_data, overrides={'frame_rate': int(sound.frame_rate * speed)})
+    return camouflaged.set_frame_rate(44100)
+
+
+@pytest.mark.parametrize("make", [lambda: _noise_burst(1, 0.15, 1.0), lambda: _footsteps(2, 3.0)])
+@pytest.mark.parametrize("speed", [0.96, 1.04])
+@pytest.mark.parametrize("lead_in_ms", [0, 1000])
+def test_camouflaged_copy_is_duplicate(make, speed, lead_in_ms):
+    original = make()
+    copy = AudioSegment.silent(lead_in_ms, frame_rate=RATE) + _camouflage(original, speed)
+    assert sfx_library.is_near_duplicate(sfx_library.fingerprint_audio(original),
+                                         sfx_library.fingerprint_audio(copy))
+
+
+@pytest.mark.parametrize("original, other", [
+    (lambda: _noise_burst(1, 0.15, 1.0), lambda: _noise_burst(11, 0.2, 1.02)),
+    (lambda: _footsteps(2, 3.0), lambda: _footsteps(22, 3.0)),
+])
+def test_different_take_is_not_duplicate(original, other):
+    assert not sfx_library.is_near_duplicate(sfx_library.fingerprint_audio(original()),
+                                             sfx_library.fingerprint_audio(other()))
+
+
+def test_exact_copy_is_found_without_decoding(tmp_path, monkeypatch):
+    sound = _noise_burst(1, 0.15, 1.0)
+    sound.export(tmp_path / "glass_1.mp3", format="wav")
+    sfx_library.register_file(str(tmp_path / "glass_1.mp3"), sfx_library.fingerprint_audio(sound), str(tmp_path))
+    sound.export(tmp_path / "glass_2.mp3", format="wav")
+
+    def fail(_):
+        raise AssertionError("decoded")
+    monkeypatch.setattr(sfx_library, "compute_fingerprint", fail)
+
+    existing, _ = sfx_library.find_duplicate(str(tmp_path / "glass_2.mp3"), "glass", str(tmp_path))
+    assert existing == str(tmp_path / "glass_1.mp3")
+
+
+def _decode_wav(monkeypatch):
+    # الملفات في الاختبار WAV باسم .mp3 حتى لا نحتاج ffmpeg
+    def compute(path):
+        try:
+            return sfx_library.fingerprint_audio(AudioSegment.from_file(path, format="wav"))
+        except Exception:
+            return None
+    monkeypatch.setattr(sfx_library, "compute_fingerprint", compute)
+
+
+def _build_library(tmp_path):
+    original = _noise_burst(1, 0.15, 1.0)
+    original.export(tmp_path / "glass_3.mp3", format="wav")
+    _camouflage(original, 0.96).export(tmp_path / "glass_7.mp3", format="wav")
+    _noise_burst(11, 0.2, 1.02).export(tmp_path / "glass_12.mp3", format="wav")
+    original.export(tmp_path / "door_1.mp3", format="wav")
+    (tmp_path / "paper_1.mp3").write_bytes(b"not audio" * 100)
+    (tmp_path / "paper_2.mp3").write_bytes(b"not audio" * 100)
+    (tmp_path / "paper_4.mp3").write_bytes(b"other bytes" * 100)
+
+
+def test_dedupe_keeps_lowest_number_within_category(tmp_path, monkeypatch, capsys):
+    _decode_wav(monkeypatch)
+    _build_library(tmp_path)
+
+    removed = sfx_library.dedupe_library(str(tmp_path))
+
+    assert sorted(removed) == [("glass_7.mp3", "glass_3.mp3"), ("paper_2.mp3", "paper_1.mp3")]
+    remaining = sorted(f for f in os.listdir(tmp_path) if f.endswith(".mp3"))
+    assert remaining == ["door_1.mp3", "glass_12.mp3", "glass_3.mp3", "paper_1.mp3", "paper_4.mp3"]
+    assert "glass_3.mp3 مطابق حرفياً لـ door_1.mp3" in capsys.readouterr().out
+    library = sfx_library.load_library(str(tmp_path))["files"]
+    assert sorted(library) == remaining
+    assert library["paper_1.mp3"]["fingerprint_failed"]
+
+
+def test_dedupe_dry_run_writes_nothing(tmp_path, monkeypatch):
+    _decode_wav(monkeypatch)
+    _build_library(tmp_path)
+    before = sorted(os.listdir(tmp_path))
+
+    removed = sfx_library.dedupe_library(str(tmp_path), dry_run=True)
+
+    assert len(removed) == 2
+    assert sorted(os.listdir(tmp_path)) == before
+
+
+def test_known_source_url_is_found(tmp_path):
+    sound = _noise_burst(1, 0.15, 1.0)
+    sound.export(tmp_path / "glass_1.mp3", format="wav")
+    sfx_library.register_file(str(tmp_path / "glass_1.mp3"), sfx_library.fingerprint_audio(sound),
+                              str(tmp_path), source_url="https://example.com/a")
+    sfx_library.remember_source(str(tmp_path / "glass_1.mp3"), "https://example.com/b", str(tmp_path))
+
+    for url in ("https://example.com/a", "https://example.com/b"):
+        assert sfx_library.find_by_source(url, "glass", str(tmp_path)) == str(tmp_path / "glass_1.mp3")
+    assert sfx_library.find_by_source("https://example.com/c", "glass", str(tmp_path)) is None
+    assert sfx_library.find_by_source("https://example.com/a", "door", str(tmp_path)) is None